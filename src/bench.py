@@ -0,0 +1,360 @@
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Callable
+
+from src.local_servers import LocalModelServer
+
+ENGINE_NAMES = (
+    "naive",
+    "nano",
+    "ms",
+    "systems-naive",
+    "systems-neo4j",
+    "systems-ms",
+    "systems-ms-global",
+)
+
+
+@dataclass
+class BenchEngine:
+    name: str
+    answer: Callable[[str], object]
+    index: Callable[[], None] | None = None
+    # Called before the timed queries so answer caches start cold.
+    reset: Callable[[], None] | None = None
+    cache_stats: Callable[[], dict] | None = None
+
+
+@dataclass
+class EngineReport:
+    engine: str
+    questions: int = 0
+    errors: int = 0
+    index_s: float | None = None
+    wall_s: float = 0.0
+    qps: float = 0.0
+    p50_ms: float = 0.0
+    p95_ms: float = 0.0
+    p99_ms: float = 0.0
+    llm_calls: int = 0
+    prompt_tokens: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    first_error: str = ""
+    latencies_ms: list[float] = field(default_factory=list, repr=False)
+
+
+def load_questions(path: Path) -> list[str]:
+    """Read questions from a JSONL file or a plain text file (one per line).
+
+    JSONL rows may carry the question under ``question``, ``q`` or ``title``
+    (the latter so that ``requests.jsonl`` can be replayed as-is).
+    """
+    questions: list[str] = []
+    lines = path.read_text(encoding="utf-8-sig").splitlines()
+    if path.suffix.lower() != ".jsonl":
+        return [line.strip() for line in lines if line.strip()]
+
+    for line_no, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as exc:
+            raise ValueError(f"Invalid JSON on line {line_no} of {path}") from exc
+        for key in ("question", "q", "title"):
+            if row.get(key):
+                questions.append(str(row[key]))
+                break
+        else:
+            raise ValueError(f"No question field on line {line_no} of {path}")
+    return questions
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile; 0.0 for an empty list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def use_local_servers(server: LocalModelServer) -> None:
+    """Point the OpenAI and Gemini clients at the local stand-in server.
+
+    The ``graphrag`` CLI used by systems-ms reads its endpoints from the
+    workspace ``settings.yaml`` and is not redirected.
+    """
+    os.environ["OPENAI_BASE_URL"] = server.openai_base_url
+    os.environ["GEMINI_BASE_URL"] = server.base_url
+    for key in ("OPENAI_API_KEY", "GEMINI_API_KEY", "GRAPHRAG_API_KEY"):
+        os.environ[key] = "local-stand-in"
+
+
+def build_engine(name: str, args: argparse.Namespace) -> BenchEngine:
+    # Engines are imported lazily so that a missing optional dependency of one
+    # engine does not prevent benchmarking the others.
+    if name == "naive":
+        from src.engines import naive_rag
+        from src.retriever import Embedder
+
+        def index() -> None:
+            # Same cached loader the queries use, so the metadata index build
+            # is timed here rather than in the first query.
+            _messages, chunks, _index = naive_rag.load_story(args.story)
+            Embedder().embed([chunk.text for chunk in chunks])
+
+        return BenchEngine(
+            name,
+            lambda q: naive_rag.answer_question(args.story, q),
+            index,
+            reset=lambda: naive_rag.reset_cache(enabled=not args.no_cache),
+            cache_stats=naive_rag.cache_stats,
+        )
+    if name == "nano":
+        from src.engines import nano_graphrag_rag
+
+        return BenchEngine(
+            name, lambda q: nano_graphrag_rag.answer_question(args.story, q)
+        )
+    if name == "ms":
+        from src.engines import ms_graphrag_rag
+
+        return BenchEngine(
+            name, lambda q: ms_graphrag_rag.answer_question(args.story, q)
+        )
+    if name == "systems-naive":
+        from systems import naive_rag as systems_naive
+
+        embed_model = os.getenv("EMBED_MODEL", "text-embedding-3-small")
+        llm_model = os.getenv("LLM_MODEL", "gpt-4o-mini")
+        return BenchEngine(
+            name,
+            lambda q: systems_naive.ask_story(
+                args.text_story, q, args.topk, embed_model, llm_model
+            ),
+        )
+    if name == "systems-neo4j":
+        from systems.neo4j_rag import Neo4jRAG
+
+        app = Neo4jRAG()
+        return BenchEngine(
+            name,
+            lambda q: app.ask(q, top_k=args.topk),
+            lambda: app.index_story(args.text_story),
+        )
+    if name == "systems-ms":
+        from systems import ms_graphrag
+
+        root = args.ms_root or ms_graphrag.WORKSPACE_ROOT
+
+        def index() -> None:
+            if not (root / "settings.yaml").exists():
+                ms_graphrag.init_workspace(root)
+            ms_graphrag.build_index(args.text_story, root)
+
+        return BenchEngine(name, lambda q: ms_graphrag.query(q, root), index)
+    if name == "systems-ms-global":
+        from systems import ms_graphrag
+
+        root = args.ms_root or ms_graphrag.WORKSPACE_ROOT
+        # Times only the community-index precompute; the GraphRAG index itself
+        # is measured by the systems-ms engine.
+        return BenchEngine(
+            name,
+            lambda q: ms_graphrag.global_query(
+                q, token_budget=args.budget, root=root
+            ),
+            lambda: ms_graphrag.build_community_index(root),
+        )
+    raise ValueError(f"Unknown engine: {name}")
+
+
+def run_engine(
+    engine: BenchEngine,
+    questions: list[str],
+    concurrency: int,
+    server: LocalModelServer | None,
+    skip_index: bool = False,
+) -> EngineReport:
+    report = EngineReport(engine=engine.name, questions=len(questions))
+
+    if engine.index is not None and not skip_index:
+        start = time.perf_counter()
+        try:
+            engine.index()
+        except Exception as exc:
+            report.errors = len(questions)
+            report.first_error = f"index failed: {exc}"
+            return report
+        report.index_s = time.perf_counter() - start
+
+    if engine.reset is not None:
+        engine.reset()
+
+    errors: list[str] = []
+
+    def timed(question: str) -> float | None:
+        start = time.perf_counter()
+        try:
+            engine.answer(question)
+        except Exception as exc:
+            errors.append(str(exc))
+            return None
+        return (time.perf_counter() - start) * 1000
+
+    usage_before = server.usage() if server is not None else None
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        results = list(pool.map(timed, questions))
+    report.wall_s = time.perf_counter() - start
+
+    if server is not None and usage_before is not None:
+        usage_after = server.usage()
+        report.llm_calls = usage_after["llm_calls"] - usage_before["llm_calls"]
+        report.prompt_tokens = (
+            usage_after["prompt_tokens"] - usage_before["prompt_tokens"]
+        )
+
+    if engine.cache_stats is not None:
+        stats = engine.cache_stats()
+        report.cache_hits = int(stats["hits"])
+        report.cache_misses = int(stats["misses"])
+
+    report.latencies_ms = [value for value in results if value is not None]
+    report.errors = len(errors)
+    report.first_error = errors[0] if errors else ""
+    report.qps = len(report.latencies_ms) / report.wall_s if report.wall_s else 0.0
+    report.p50_ms = percentile(report.latencies_ms, 50)
+    report.p95_ms = percentile(report.latencies_ms, 95)
+    report.p99_ms = percentile(report.latencies_ms, 99)
+    return report
+
+
+def format_reports(reports: list[EngineReport]) -> str:
+    header = (
+        f"{'engine':<18} {'n':>4} {'err':>4} {'index_s':>8} {'p50_ms':>9} "
+        f"{'p95_ms':>9} {'p99_ms':>9} {'q/s':>8} {'llm':>5} {'prompt_tok':>10} "
+        f"{'cache_hit':>9}"
+    )
+    lines = [header, "-" * len(header)]
+    for r in reports:
+        index_s = f"{r.index_s:.2f}" if r.index_s is not None else "-"
+        lines.append(
+            f"{r.engine:<18} {r.questions:>4} {r.errors:>4} {index_s:>8} "
+            f"{r.p50_ms:>9.1f} {r.p95_ms:>9.1f} {r.p99_ms:>9.1f} {r.qps:>8.2f} "
+            f"{r.llm_calls:>5} {r.prompt_tokens:>10} {r.cache_hits:>9}"
+        )
+    for r in reports:
+        if r.first_error:
+            lines.append(f"[{r.engine}] first error: {r.first_error}")
+    return "\n".join(lines)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Replay a question file against each engine and report latency"
+    )
+    parser.add_argument("--questions", type=Path, default=Path("requests.jsonl"))
+    parser.add_argument(
+        "--story",
+        type=Path,
+        default=Path("stories/whodunit_sydney.xml"),
+        help="XML story for the src.main engines",
+    )
+    parser.add_argument(
+        "--text-story",
+        type=Path,
+        default=Path("data/story.txt"),
+        help="Plain text story for the systems/ engines",
+    )
+    parser.add_argument(
+        "--engines", nargs="+", choices=ENGINE_NAMES, default=["naive"]
+    )
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--topk", type=int, default=5)
+    parser.add_argument(
+        "--budget",
+        type=int,
+        default=8000,
+        help="Token budget for systems-ms-global community selection",
+    )
+    parser.add_argument(
+        "--ms-root",
+        type=Path,
+        help="GraphRAG workspace for the systems-ms engines "
+        "(default: ms_graphrag_workspace)",
+    )
+    parser.add_argument("--skip-index", action="store_true")
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Disable the naive engine's semantic answer cache",
+    )
+    parser.add_argument(
+        "--llm-latency",
+        type=float,
+        default=0.0,
+        help="Seconds the stand-in LLM sleeps per completion",
+    )
+    parser.add_argument(
+        "--live",
+        action="store_true",
+        help="Use the real APIs from .env instead of the local stand-ins",
+    )
+    parser.add_argument("--json", type=Path, help="Write the reports as JSON")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    questions = load_questions(args.questions) * max(1, args.repeat)
+    if not questions:
+        raise SystemExit(f"No questions found in {args.questions}")
+
+    server: LocalModelServer | None = None
+    if not args.live:
+        server = LocalModelServer(latency_s=args.llm_latency).start()
+        use_local_servers(server)
+
+    reports: list[EngineReport] = []
+    try:
+        for name in args.engines:
+            try:
+                engine = build_engine(name, args)
+            except Exception as exc:
+                reports.append(
+                    EngineReport(
+                        engine=name,
+                        questions=len(questions),
+                        errors=len(questions),
+                        first_error=f"setup failed: {exc}",
+                    )
+                )
+                continue
+            reports.append(
+                run_engine(engine, questions, args.concurrency, server, args.skip_index)
+            )
+    finally:
+        if server is not None:
+            server.stop()
+
+    print(format_reports(reports))
+    if args.json:
+        args.json.write_text(
+            json.dumps([asdict(r) for r in reports], indent=2), encoding="utf-8"
+        )
+
+
+if __name__ == "__main__":
+    main()
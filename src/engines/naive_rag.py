@@ -1,29 +1,110 @@
 from __future__ import annotations
 
+import os
+from dataclasses import dataclass, field
+from functools import lru_cache
 from pathlib import Path
+from typing import Iterator
 
-from src.chunker import chunk_messages
+import numpy as np
+
+from src.chunker import Chunk, chunk_messages
 from src.gemini_client import GeminiClient
+from src.metadata_index import MetadataIndex, StoryFilter, parse_filters
 from src.prompt_builder import PromptBuilder, PromptTooLongError
 from src.retriever import Embedder, rank_chunks
-from src.story_loader import load_story_xml
+from src.semantic_cache import DEFAULT_THRESHOLD, SemanticCache, story_version
+from src.story_loader import Message, load_participants, load_story_xml
+
+_SEMANTIC_CACHE = SemanticCache(
+    max_entries=int(os.getenv("SEMANTIC_CACHE_SIZE", "256")),
+    threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", DEFAULT_THRESHOLD)),
+)
+
+
+def cache_stats() -> dict[str, float]:
+    return _SEMANTIC_CACHE.stats()
+
+
+def reset_cache(enabled: bool = True) -> None:
+    _SEMANTIC_CACHE.clear()
+    _SEMANTIC_CACHE.enabled = enabled
 
 
-def answer_question(story_path: Path, question: str) -> dict:
+@dataclass
+class Retrieval:
+    """Everything needed to generate an answer, or the final result if
+    retrieval already settled the question (e.g. no usable chunks)."""
+
+    prompt: str = ""
+    evidence: list[dict] = field(default_factory=list)
+    version: str = ""
+    question_embedding: np.ndarray | None = None
+    chunk_ids: list[int] = field(default_factory=list)
+    result: dict | None = None
+
+
+@lru_cache(maxsize=8)
+def _load_story(
+    story_path: Path, version: str
+) -> tuple[list[Message], list[Chunk], MetadataIndex]:
+    # Keyed by content hash as well as path, so an edited story is reloaded.
     messages = load_story_xml(story_path)
     chunks = chunk_messages(messages, messages_per_chunk=3)
-    ranked = rank_chunks(question, chunks, Embedder())
+    index = MetadataIndex(messages, chunks, load_participants(story_path))
+    return messages, chunks, index
+
+
+def load_story(story_path: Path) -> tuple[list[Message], list[Chunk], MetadataIndex]:
+    """Messages, chunks and metadata index for the current story content."""
+    return _load_story(story_path, story_version(story_path))
+
+
+def _candidate_chunk_ids(
+    index: MetadataIndex, question: str, filters: StoryFilter | None
+) -> set[int] | None:
+    if filters is not None:
+        return index.chunk_ids(filters)
+    # Filters parsed from the question are a hint: a component that matches
+    # nothing is dropped, and if the rest still match nothing, every chunk is
+    # scored.
+    parsed = index.without_unmatched(
+        parse_filters(question, index.participants, index.chapters)
+    )
+    if parsed.is_empty():
+        return None
+    return index.chunk_ids(parsed) or None
+
+
+def retrieve(
+    story_path: Path, question: str, filters: StoryFilter | None = None
+) -> Retrieval:
+    version = story_version(story_path)
+    _messages, chunks, index = _load_story(story_path, version)
+    candidate_ids = _candidate_chunk_ids(index, question, filters)
+    if candidate_ids is not None and not candidate_ids:
+        return Retrieval(
+            result={
+                "answer": "I couldn't answer using Gemini.",
+                "evidence": [],
+                "why_not": "No messages match the given filters.",
+            }
+        )
+    embedder = Embedder()
+    ranked = rank_chunks(question, chunks, embedder, candidate_ids)
 
     top_k = min(4, len(ranked))
     prompt_builder = PromptBuilder()
     selected_chunks = []
     prompt = ""
     if top_k == 0:
-        return {
-            "answer": "I couldn't answer using Gemini.",
-            "evidence": [],
-            "why_not": "No chunks available for retrieval.",
-        }
+        return Retrieval(
+            result={
+                "answer": "I couldn't answer using Gemini.",
+                "evidence": [],
+                "why_not": "No chunks available for retrieval.",
+            }
+        )
 
     while top_k >= 1:
         selected_chunks = [chunk for chunk, _score in ranked[:top_k]]
@@ -35,26 +116,108 @@ def answer_question(story_path: Path, question: str) -> dict:
         except PromptTooLongError:
             top_k -= 1
     else:
-        return {
-            "answer": "I couldn't answer using Gemini.",
-            "evidence": [],
-            "why_not": "Prompt too long even with 1 chunk.",
-        }
+        return Retrieval(
+            result={
+                "answer": "I couldn't answer using Gemini.",
+                "evidence": [],
+                "why_not": "Prompt too long even with 1 chunk.",
+            }
+        )
 
     evidence = [
         {"chunk_id": chunk.chunk_id, "text": chunk.text} for chunk in selected_chunks
     ]
+    return Retrieval(
+        prompt=prompt,
+        evidence=evidence,
+        version=version,
+        question_embedding=embedder.embed([question])[0],
+        chunk_ids=[chunk.chunk_id for chunk in selected_chunks],
+    )
+
+
+def _cached(retrieval: Retrieval) -> dict | None:
+    # Near-duplicate questions that pick the same evidence reuse the cached
+    # answer instead of calling Gemini again. This runs at generation time,
+    # not in retrieve(), so a prefetched retrieval still sees answers stored
+    # by the generation that was running while it was prefetched.
+    if retrieval.result is not None:
+        return retrieval.result
+    return _SEMANTIC_CACHE.lookup(
+        retrieval.version, retrieval.question_embedding, retrieval.chunk_ids
+    )
+
+
+def _finish(retrieval: Retrieval, gemini_text: str) -> dict:
+    result = {
+        "answer": gemini_text,
+        "evidence": retrieval.evidence,
+        "why_not": "",
+    }
+    _SEMANTIC_CACHE.store(
+        retrieval.version, retrieval.question_embedding, retrieval.chunk_ids, result
+    )
+    return result
+
+
+def answer_question(
+    story_path: Path, question: str, filters: StoryFilter | None = None
+) -> dict:
+    retrieval = retrieve(story_path, question, filters)
+    cached = _cached(retrieval)
+    if cached is not None:
+        return cached
+
     try:
-        gemini_text = GeminiClient().generate(prompt)
+        gemini_text = GeminiClient().generate(retrieval.prompt)
     except Exception as exc:
         return {
             "answer": "I couldn't answer using Gemini.",
-            "evidence": evidence,
+            "evidence": retrieval.evidence,
             "why_not": str(exc),
         }
 
-    return {
-        "answer": gemini_text,
-        "evidence": evidence,
-        "why_not": "",
-    }
+    return _finish(retrieval, gemini_text)
+
+
+class StreamingAnswer:
+    """Iterate to receive answer text as Gemini produces it.
+
+    Retrieval has already run when this object is created; generation starts
+    on iteration. ``result`` holds the same dict as ``answer_question`` once
+    iteration has finished.
+    """
+
+    def __init__(self, retrieval: Retrieval) -> None:
+        self._retrieval = retrieval
+        self.result: dict | None = None
+
+    def __iter__(self) -> Iterator[str]:
+        cached = _cached(self._retrieval)
+        if cached is not None:
+            self.result = cached
+            yield cached["answer"]
+            return
+
+        pieces: list[str] = []
+        try:
+            for text in GeminiClient().generate_stream(self._retrieval.prompt):
+                pieces.append(text)
+                yield text
+        except Exception as exc:
+            if not pieces:
+                yield "I couldn't answer using Gemini."
+            self.result = {
+                "answer": "".join(pieces) or "I couldn't answer using Gemini.",
+                "evidence": self._retrieval.evidence,
+                "why_not": str(exc),
+            }
+            return
+
+        self.result = _finish(self._retrieval, "".join(pieces))
+
+
+def answer_question_stream(
+    story_path: Path, question: str, filters: StoryFilter | None = None
+) -> StreamingAnswer:
+    return StreamingAnswer(retrieve(story_path, question, filters))
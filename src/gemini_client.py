@@ -1,9 +1,11 @@
 from __future__ import annotations
 
 import os
+from typing import Iterator
 
 from dotenv import load_dotenv
 from google import genai
+from google.genai import types
 
 
 load_dotenv()
@@ -15,7 +17,11 @@ class GeminiClient:
         if not api_key:
             raise ValueError("GEMINI_API_KEY is not set")
 
-        self._client = genai.Client(api_key=api_key)
+        # GEMINI_BASE_URL points the client at a compatible endpoint, e.g. the
+        # offline stand-in from src.local_servers used by src.bench.
+        base_url = os.getenv("GEMINI_BASE_URL")
+        http_options = types.HttpOptions(base_url=base_url) if base_url else None
+        self._client = genai.Client(api_key=api_key, http_options=http_options)
         self._model = model
 
     def generate(self, prompt: str) -> str:
@@ -26,3 +32,15 @@ class GeminiClient:
         if not text:
             raise RuntimeError("Gemini returned empty response")
         return text
+
+    def generate_stream(self, prompt: str) -> Iterator[str]:
+        produced = False
+        for chunk in self._client.models.generate_content_stream(
+            model=self._model, contents=prompt
+        ):
+            text = chunk.text
+            if text:
+                produced = True
+                yield text
+        if not produced:
+            raise RuntimeError("Gemini returned empty response")
@@ -0,0 +1,288 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator
+from urllib.parse import urlparse
+
+from systems.token_estimate import estimate_tokens
+
+_TOKEN_RE = re.compile(r"\w+")
+_GEMINI_PATH_RE = re.compile(
+    r"^/v1(?:beta|alpha)?/models/(?P<model>[^:/]+):(?P<method>generateContent|streamGenerateContent)$"
+)
+
+
+def embedding_dimensions(model_name: str) -> int:
+    if model_name == "text-embedding-3-large":
+        return 3072
+    return 1536
+
+
+def fake_embedding(text: str, dimensions: int) -> list[float]:
+    """Deterministic hashed bag-of-words vector, L2 normalized."""
+    vector = [0.0] * dimensions
+    for token in _TOKEN_RE.findall(text.lower()):
+        digest = hashlib.sha1(token.encode("utf-8")).digest()
+        index = int.from_bytes(digest[:4], "little") % dimensions
+        vector[index] += 1.0 if digest[4] & 1 else -1.0
+    norm = math.sqrt(sum(value * value for value in vector))
+    if norm == 0.0:
+        return vector
+    return [value / norm for value in vector]
+
+
+def fake_answer(prompt: str, answer_words: int) -> str:
+    """Deterministic answer text derived from the prompt."""
+    digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    words = [f"w{digest[i % len(digest)]}{i}" for i in range(answer_words)]
+    return "Stand-in answer: " + " ".join(words)
+
+
+class LocalModelServer:
+    """Offline stand-in for the OpenAI and Gemini HTTP APIs.
+
+    Serves OpenAI-compatible ``/v1/embeddings`` and ``/v1/chat/completions``
+    and Gemini-compatible ``models/<model>:generateContent`` (plus the
+    server-sent-events ``streamGenerateContent``) so that every engine can run
+    without network access. Responses are deterministic and prompt token usage
+    is counted so callers can compare LLM cost.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency_s: float = 0.0,
+        answer_words: int = 40,
+        stream_chunk_words: int = 4,
+        stream_chunk_latency_s: float = 0.0,
+    ) -> None:
+        self.latency_s = latency_s
+        self.answer_words = answer_words
+        self.stream_chunk_words = stream_chunk_words
+        self.stream_chunk_latency_s = stream_chunk_latency_s
+        self._lock = threading.Lock()
+        self._prompt_tokens = 0
+        self._embedding_tokens = 0
+        self._llm_calls = 0
+        self._embedding_calls = 0
+        self._httpd = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._httpd.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def openai_base_url(self) -> str:
+        return f"{self.base_url}/v1"
+
+    def start(self) -> LocalModelServer:
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, name="local-model-server", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> LocalModelServer:
+        return self.start()
+
+    def __exit__(self, *_exc: object) -> None:
+        self.stop()
+
+    def usage(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "llm_calls": self._llm_calls,
+                "prompt_tokens": self._prompt_tokens,
+                "embedding_calls": self._embedding_calls,
+                "embedding_tokens": self._embedding_tokens,
+            }
+
+    def _record_llm(self, prompt: str) -> int:
+        tokens = estimate_tokens(prompt)
+        with self._lock:
+            self._llm_calls += 1
+            self._prompt_tokens += tokens
+        return tokens
+
+    def _record_embedding(self, texts: list[str]) -> int:
+        tokens = sum(estimate_tokens(text) for text in texts)
+        with self._lock:
+            self._embedding_calls += 1
+            self._embedding_tokens += tokens
+        return tokens
+
+    def handle_embeddings(self, payload: dict) -> dict:
+        texts = payload.get("input", [])
+        if isinstance(texts, str):
+            texts = [texts]
+        model = payload.get("model", "text-embedding-3-small")
+        dimensions = payload.get("dimensions") or embedding_dimensions(model)
+        tokens = self._record_embedding(texts)
+        return {
+            "object": "list",
+            "model": model,
+            "data": [
+                {
+                    "object": "embedding",
+                    "index": i,
+                    "embedding": fake_embedding(text, dimensions),
+                }
+                for i, text in enumerate(texts)
+            ],
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+    def handle_chat(self, payload: dict) -> dict:
+        prompt = "\n".join(
+            str(message.get("content", "")) for message in payload.get("messages", [])
+        )
+        tokens = self._record_llm(prompt)
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        answer = fake_answer(prompt, self.answer_words)
+        completion_tokens = estimate_tokens(answer)
+        return {
+            "id": "chatcmpl-local",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "local"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": answer},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": tokens + completion_tokens,
+            },
+        }
+
+    def handle_gemini(self, payload: dict) -> dict:
+        prompt = _gemini_prompt(payload)
+        tokens = self._record_llm(prompt)
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        return _gemini_response(fake_answer(prompt, self.answer_words), tokens)
+
+    def handle_gemini_stream(self, payload: dict) -> Iterator[dict]:
+        """Yield the answer in chunks of ``stream_chunk_words`` words.
+
+        ``latency_s`` is the time to the first chunk and
+        ``stream_chunk_latency_s`` the gap between later chunks.
+        """
+        prompt = _gemini_prompt(payload)
+        tokens = self._record_llm(prompt)
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        words = fake_answer(prompt, self.answer_words).split(" ")
+        step = max(1, self.stream_chunk_words)
+        for start in range(0, len(words), step):
+            if start and self.stream_chunk_latency_s:
+                time.sleep(self.stream_chunk_latency_s)
+            text = " ".join(words[start : start + step])
+            if start + step < len(words):
+                text += " "
+            yield _gemini_response(text, tokens)
+
+
+def _gemini_prompt(payload: dict) -> str:
+    return "\n".join(
+        str(part.get("text", ""))
+        for content in payload.get("contents", [])
+        for part in content.get("parts", [])
+    )
+
+
+def _gemini_response(text: str, prompt_tokens: int) -> dict:
+    completion_tokens = estimate_tokens(text)
+    return {
+        "candidates": [
+            {
+                "content": {"role": "model", "parts": [{"text": text}]},
+                "finishReason": "STOP",
+                "index": 0,
+            }
+        ],
+        "usageMetadata": {
+            "promptTokenCount": prompt_tokens,
+            "candidatesTokenCount": completion_tokens,
+            "totalTokenCount": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+def _make_handler(server: LocalModelServer) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format: str, *args: object) -> None:
+            return
+
+        def do_POST(self) -> None:
+            length = int(self.headers.get("Content-Length", "0"))
+            try:
+                payload = json.loads(self.rfile.read(length) or b"{}")
+            except json.JSONDecodeError:
+                self._send_json(400, {"error": {"message": "invalid JSON body"}})
+                return
+
+            path = urlparse(self.path).path
+            if path.endswith("/embeddings"):
+                self._send_json(200, server.handle_embeddings(payload))
+                return
+            if path.endswith("/chat/completions"):
+                self._send_json(200, server.handle_chat(payload))
+                return
+            match = _GEMINI_PATH_RE.match(path)
+            if match and match.group("method") == "streamGenerateContent":
+                self._send_events(server.handle_gemini_stream(payload))
+                return
+            if match:
+                self._send_json(200, server.handle_gemini(payload))
+                return
+            self._send_json(404, {"error": {"message": f"unknown path {path}"}})
+
+        def _send_json(self, status: int, body: dict) -> None:
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _send_events(self, events: Iterator[dict]) -> None:
+            # Server-sent events over chunked transfer, flushed per event so
+            # clients see each piece as soon as it is produced.
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for event in events:
+                data = f"data: {json.dumps(event)}\r\n\r\n".encode("utf-8")
+                size = f"{len(data):X}\r\n".encode("ascii")
+                self.wfile.write(size + data + b"\r\n")
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+
+    return Handler
@@ -1,10 +1,17 @@
 from __future__ import annotations
 
 import argparse
+import queue
+import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 
 from src.engines import ms_graphrag_rag, naive_rag, nano_graphrag_rag
 
+_EXIT = object()
+
+
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="AI Investigator CLI")
     parser.add_argument("--story", required=True, help="Path to story file")
@@ -14,7 +21,15 @@ def parse_args() -> argparse.Namespace:
         default="naive",
         help="RAG engine to use",
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Print the answer as it is generated (naive engine only)",
+    )
+    args = parser.parse_args()
+    if args.stream and select_stream_engine(args.engine) is None:
+        parser.error(f"--stream is not supported by the {args.engine} engine")
+    return args
 
 
 def select_engine(engine_name: str):
@@ -25,6 +40,69 @@ def select_engine(engine_name: str):
     return ms_graphrag_rag.answer_question
 
 
+def select_stream_engine(engine_name: str):
+    if engine_name == "naive":
+        return naive_rag.answer_question_stream
+    return None
+
+
+def print_evidence(result: dict) -> None:
+    if result.get("why_not"):
+        print(f"Why not: {result['why_not']}")
+    evidence = result.get("evidence") or []
+    if evidence:
+        print("Evidence:")
+        for item in evidence:
+            print(f"[chunk {item['chunk_id']}]\n{item['text']}")
+
+
+def _read_questions(
+    story_path: Path,
+    stream_fn,
+    retrieval_pool: ThreadPoolExecutor,
+    answers: queue.Queue,
+) -> None:
+    # Retrieval is submitted as soon as a question is read, so it overlaps
+    # with whatever answer is streaming on the main thread.
+    try:
+        for line in sys.stdin:
+            question = line.strip()
+            if question.lower() == "exit":
+                break
+            if question:
+                answers.put(retrieval_pool.submit(stream_fn, story_path, question))
+    except RuntimeError:
+        # The pool was shut down because the REPL is exiting.
+        return
+    answers.put(_EXIT)
+
+
+def run_streaming_repl(story_path: Path, stream_fn) -> None:
+    # Stdin is read on a background thread; each question's retrieval runs on
+    # the worker thread, in order, while earlier answers are still streaming.
+    answers: queue.Queue = queue.Queue()
+    with ThreadPoolExecutor(max_workers=1) as retrieval_pool:
+        threading.Thread(
+            target=_read_questions,
+            args=(story_path, stream_fn, retrieval_pool, answers),
+            daemon=True,
+        ).start()
+        while True:
+            if answers.empty():
+                print("> ", end="", flush=True)
+            upcoming: Future | object = answers.get()
+            if upcoming is _EXIT:
+                break
+
+            answer = upcoming.result()
+            for text in answer:
+                print(text, end="", flush=True)
+            print()
+            print_evidence(answer.result or {})
+
+    print("Exiting.")
+
+
 def main() -> None:
     args = parse_args()
     story_path = Path(args.story)
@@ -32,6 +110,13 @@ def main() -> None:
 
     print("AI Investigator 1.0. Ask me any question about the story")
 
+    if args.stream:
+        try:
+            run_streaming_repl(story_path, select_stream_engine(args.engine))
+        except KeyboardInterrupt:
+            print("\nExiting.")
+        return
+
     while True:
         try:
             question = input("> ").strip()
@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import re
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field, replace
+
+from src.chunker import Chunk
+from src.story_loader import Message, Participants
+
+_CLOCK_RE = re.compile(r"(?:^|T|\s)(\d{1,2}):(\d{2})(?::(\d{2}))?")
+_QUESTION_TIME = r"(\d{1,2}):(\d{2})\s*(am|pm)?"
+_BETWEEN_RE = re.compile(
+    rf"\bbetween\s+{_QUESTION_TIME}\s+and\s+{_QUESTION_TIME}", re.IGNORECASE
+)
+_AFTER_RE = re.compile(rf"\b(?:after|since|from)\s+{_QUESTION_TIME}", re.IGNORECASE)
+_BEFORE_RE = re.compile(rf"\b(?:before|until|till)\s+{_QUESTION_TIME}", re.IGNORECASE)
+_AT_RE = re.compile(rf"\b(?:at|around)\s+{_QUESTION_TIME}", re.IGNORECASE)
+_CHAPTER_RE = re.compile(r"\bchapter\s+(\w+)", re.IGNORECASE)
+_WORD_RE = re.compile(r"[\w']+")
+_NUMBER_WORDS = {
+    "one": "1", "two": "2", "three": "3", "four": "4", "five": "5", "six": "6",
+    "seven": "7", "eight": "8", "nine": "9", "ten": "10",
+}
+_SEND_VERBS = {
+    "send", "sent", "text", "texted", "write", "wrote", "say", "said", "message",
+    "messaged",
+}
+_RECEIVE_VERBS = {"receive", "received", "get", "got"}
+
+
+@dataclass
+class StoryFilter:
+    """Structured restrictions applied before similarity scoring.
+
+    Times are seconds since midnight (inclusive bounds); the date is not
+    compared, so a time range matches that time of day on every day of the
+    story. ``participants`` matches a message whose sender or receiver is
+    listed.
+    """
+
+    time_from: int | None = None
+    time_to: int | None = None
+    senders: set[str] = field(default_factory=set)
+    receivers: set[str] = field(default_factory=set)
+    participants: set[str] = field(default_factory=set)
+    chapters: set[str] = field(default_factory=set)
+
+    def is_empty(self) -> bool:
+        return (
+            self.time_from is None
+            and self.time_to is None
+            and not self.senders
+            and not self.receivers
+            and not self.participants
+            and not self.chapters
+        )
+
+
+def seconds_of_day(value: str) -> int | None:
+    """Time of day of an ISO timestamp or ``HH:MM[:SS]`` string, in seconds."""
+    match = _CLOCK_RE.search(value)
+    if match is None:
+        return None
+    hours, minutes, seconds = match.group(1), match.group(2), match.group(3) or "0"
+    return int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+
+
+def _question_seconds(hours: str, minutes: str, meridiem: str | None) -> int:
+    hour = int(hours) % 24
+    if meridiem and meridiem.lower() == "pm" and hour < 12:
+        hour += 12
+    if meridiem and meridiem.lower() == "am" and hour == 12:
+        hour = 0
+    return hour * 3600 + int(minutes) * 60
+
+
+def parse_filters(
+    question: str, participants: set[str], chapters: set[str] | None = None
+) -> StoryFilter:
+    """Best-effort extraction of a StoryFilter from a natural language question.
+
+    A name only filters when a preposition or verb says which side of the
+    message it is on ("from Liam", "Liam sent", "to Zoe"); a bare mention
+    ("Where was Liam?") is left to similarity ranking. "chapter 2" and
+    "chapter two" only filter when the id is one of ``chapters`` (or, without
+    a list of known chapters, is numeric), so "the chapter where..." does not.
+    """
+    story_filter = StoryFilter()
+
+    if match := _BETWEEN_RE.search(question):
+        story_filter.time_from = _question_seconds(*match.group(1, 2, 3))
+        story_filter.time_to = _question_seconds(*match.group(4, 5, 6)) + 59
+    else:
+        if match := _AFTER_RE.search(question):
+            story_filter.time_from = _question_seconds(*match.group(1, 2, 3))
+        if match := _BEFORE_RE.search(question):
+            story_filter.time_to = _question_seconds(*match.group(1, 2, 3)) - 1
+        if (
+            story_filter.time_from is None
+            and story_filter.time_to is None
+            and (match := _AT_RE.search(question))
+        ):
+            minute = _question_seconds(*match.group(1, 2, 3))
+            story_filter.time_from, story_filter.time_to = minute, minute + 59
+
+    for match in _CHAPTER_RE.finditer(question):
+        chapter = match.group(1)
+        chapter = _NUMBER_WORDS.get(chapter.lower(), chapter)
+        known = chapter in chapters if chapters is not None else chapter.isdigit()
+        if known:
+            story_filter.chapters.add(chapter)
+
+    known = {participant.lower(): participant for participant in participants}
+    words = [word.lower() for word in _WORD_RE.findall(question)]
+    for i, word in enumerate(words):
+        name = known.get(word.removesuffix("'s"))
+        if name is None:
+            continue
+        previous = words[i - 1] if i > 0 else ""
+        following = words[i + 1] if i + 1 < len(words) else ""
+        if previous == "from" or following in _SEND_VERBS:
+            story_filter.senders.add(name)
+        elif previous == "to" or following in _RECEIVE_VERBS:
+            story_filter.receivers.add(name)
+    return story_filter
+
+
+class MetadataIndex:
+    """Sorted time index and sender/receiver/chapter postings over messages.
+
+    Postings hold message positions; ``chunk_ids`` maps the surviving
+    positions to the chunks built from the same message list. A message sent
+    to a group is posted as received by every member of the group other than
+    its sender; members are the group's declared ``<member>`` refs, or else
+    everyone who posted to it.
+    """
+
+    def __init__(
+        self,
+        messages: list[Message],
+        chunks: list[Chunk],
+        participants: Participants | None = None,
+    ) -> None:
+        self._size = len(messages)
+        timed = sorted(
+            (seconds, position)
+            for position, message in enumerate(messages)
+            if (seconds := seconds_of_day(message.ts)) is not None
+        )
+        self._time_keys = [seconds for seconds, _position in timed]
+        self._time_positions = [position for _seconds, position in timed]
+
+        self._senders: dict[str, set[int]] = {}
+        self._receivers: dict[str, set[int]] = {}
+        self._chapters: dict[str, set[int]] = {}
+        for position, message in enumerate(messages):
+            if message.sender:
+                self._senders.setdefault(message.sender, set()).add(position)
+            if message.receiver:
+                self._receivers.setdefault(message.receiver, set()).add(position)
+            if message.chapter:
+                self._chapters.setdefault(message.chapter, set()).add(position)
+
+        if participants is None or not participants.persons:
+            self._persons = set(self._senders) | set(self._receivers)
+        else:
+            self._persons = set(participants.persons)
+        groups = participants.groups if participants is not None else {}
+        for group, members in groups.items():
+            positions = self._receivers.get(group, set())
+            members = members or {messages[position].sender for position in positions}
+            for position in positions:
+                for member in members - {messages[position].sender}:
+                    self._receivers.setdefault(member, set()).add(position)
+
+        # chunk_messages slices the message list in order.
+        self._chunk_of: list[int] = []
+        for chunk in chunks:
+            self._chunk_of.extend([chunk.chunk_id] * len(chunk.message_ids))
+
+    @property
+    def chapters(self) -> set[str]:
+        return set(self._chapters)
+
+    @property
+    def participants(self) -> set[str]:
+        """Person ids that question parsing may turn into filters."""
+        return set(self._persons)
+
+    def _time_range(self, start: int | None, end: int | None) -> set[int]:
+        lo = 0 if start is None else bisect_left(self._time_keys, start)
+        hi = len(self._time_keys) if end is None else bisect_right(self._time_keys, end)
+        return set(self._time_positions[lo:hi])
+
+    def _postings(self, postings: dict[str, set[int]], keys: set[str]) -> set[int]:
+        positions: set[int] = set()
+        for key in keys:
+            positions |= postings.get(key, set())
+        return positions
+
+    def message_positions(self, story_filter: StoryFilter) -> set[int]:
+        candidates: set[int] | None = None
+
+        def narrow(positions: set[int]) -> None:
+            nonlocal candidates
+            candidates = positions if candidates is None else candidates & positions
+
+        if story_filter.time_from is not None or story_filter.time_to is not None:
+            narrow(self._time_range(story_filter.time_from, story_filter.time_to))
+        if story_filter.senders:
+            narrow(self._postings(self._senders, story_filter.senders))
+        if story_filter.receivers:
+            narrow(self._postings(self._receivers, story_filter.receivers))
+        if story_filter.participants:
+            narrow(
+                self._postings(self._senders, story_filter.participants)
+                | self._postings(self._receivers, story_filter.participants)
+            )
+        if story_filter.chapters:
+            narrow(self._postings(self._chapters, story_filter.chapters))
+
+        if candidates is None:
+            return set(range(self._size))
+        return candidates
+
+    def without_unmatched(self, story_filter: StoryFilter) -> StoryFilter:
+        """Copy of ``story_filter`` minus each component that on its own
+        matches no message, so one bad component does not void the rest."""
+        empty = StoryFilter()
+        components = [
+            {"time_from": story_filter.time_from, "time_to": story_filter.time_to},
+            {"senders": story_filter.senders},
+            {"receivers": story_filter.receivers},
+            {"participants": story_filter.participants},
+            {"chapters": story_filter.chapters},
+        ]
+        kept = StoryFilter()
+        for component in components:
+            alone = replace(empty, **component)
+            if not alone.is_empty() and self.message_positions(alone):
+                kept = replace(kept, **component)
+        return kept
+
+    def chunk_ids(self, story_filter: StoryFilter) -> set[int]:
+        return {
+            self._chunk_of[position]
+            for position in self.message_positions(story_filter)
+            if position < len(self._chunk_of)
+        }
@@ -1,23 +1,88 @@
 from __future__ import annotations
 
-from math import sqrt
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING
 
-from sentence_transformers import SentenceTransformer
+import numpy as np
 
 from src.chunker import Chunk
 
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
 _MODEL: SentenceTransformer | None = None
-_EMBED_CACHE: dict[str, list[float]] = {}
+_EMBED_CACHE: dict[str, np.ndarray] = {}
 
+# Set inside each worker process by _init_worker.
+_WORKER_MODEL: SentenceTransformer | None = None
+
+
+def _get_model(model_name: str) -> SentenceTransformer:
+    global _MODEL
+    if _MODEL is None:
+        from sentence_transformers import SentenceTransformer
+
+        _MODEL = SentenceTransformer(model_name)
+    return _MODEL
+
+
+def _init_worker(model_name: str, threads_per_worker: int) -> None:
+    global _WORKER_MODEL
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    # Without this every worker spins up one torch thread per core and the
+    # pool oversubscribes the CPU instead of scaling with it.
+    torch.set_num_threads(threads_per_worker)
+    _WORKER_MODEL = SentenceTransformer(model_name, device="cpu")
+
+
+def _encode_shard(texts: list[str], batch_size: int) -> np.ndarray:
+    assert _WORKER_MODEL is not None
+    return _WORKER_MODEL.encode(
+        texts, batch_size=batch_size, convert_to_numpy=True
+    ).astype(np.float32, copy=False)
 
-class Embedder:
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2") -> None:
-        global _MODEL
-        if _MODEL is None:
-            _MODEL = SentenceTransformer(model_name)
-        self._model = _MODEL
 
-    def embed(self, texts: list[str]) -> list[list[float]]:
+def _make_pool(model_name: str, workers: int) -> ProcessPoolExecutor:
+    threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(model_name, threads_per_worker),
+    )
+
+
+class Embedder:
+    """Sentence-transformers embedder with a process-wide vector cache.
+
+    ``workers`` > 1 shards large encodes across a pool of worker processes,
+    each loading the model once; ``batch_size`` is passed to ``encode``.
+    Both default to the ``EMBED_WORKERS`` / ``EMBED_BATCH_SIZE`` env vars.
+    Because every text is encoded at most once per process, the pool only
+    lives for the encode that needs it, and the in-process model is loaded
+    only when a small encode runs here.
+    """
+
+    def __init__(
+        self,
+        model_name: str = "all-MiniLM-L6-v2",
+        workers: int | None = None,
+        batch_size: int | None = None,
+    ) -> None:
+        self._model_name = model_name
+        if workers is None:
+            workers = int(os.getenv("EMBED_WORKERS", "1"))
+        if batch_size is None:
+            batch_size = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+        self._workers = max(1, workers)
+        self._batch_size = max(1, batch_size)
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        """Return a float32 matrix with one row per input text."""
         missing_texts: list[str] = []
         seen_missing: set[str] = set()
         for text in texts:
@@ -26,37 +91,89 @@ class Embedder:
                 missing_texts.append(text)
 
         if missing_texts:
-            encoded_vectors = self._model.encode(missing_texts)
+            encoded_vectors = self._encode(missing_texts)
             for text, vector in zip(missing_texts, encoded_vectors):
-                _EMBED_CACHE[text] = [float(value) for value in vector]
-
-        return [_EMBED_CACHE[text] for text in texts]
-
-
-def cosine_similarity(a: list[float], b: list[float]) -> float:
-    if len(a) != len(b) or not a:
+                _EMBED_CACHE[text] = vector
+
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.stack([_EMBED_CACHE[text] for text in texts])
+
+    def _encode(self, texts: list[str]) -> np.ndarray:
+        # Longest first, so each batch holds texts of similar length and the
+        # tokenizer pads as little as possible.
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        sorted_texts = [texts[i] for i in order]
+
+        if self._workers == 1 or len(texts) <= self._batch_size:
+            model = _get_model(self._model_name)
+            sorted_vectors = model.encode(
+                sorted_texts, batch_size=self._batch_size, convert_to_numpy=True
+            ).astype(np.float32, copy=False)
+        else:
+            # Contiguous shards keep the length sorting inside each worker;
+            # several shards per worker even out the long-text shards.
+            shard_size = max(
+                self._batch_size, -(-len(texts) // (self._workers * 4))
+            )
+            shards = [
+                sorted_texts[i : i + shard_size]
+                for i in range(0, len(sorted_texts), shard_size)
+            ]
+            with _make_pool(self._model_name, self._workers) as pool:
+                sorted_vectors = np.concatenate(
+                    list(
+                        pool.map(
+                            _encode_shard, shards, [self._batch_size] * len(shards)
+                        )
+                    )
+                )
+
+        vectors = np.empty_like(sorted_vectors)
+        vectors[order] = sorted_vectors
+        return vectors
+
+
+def cosine_similarity(a: np.ndarray, b: np.ndarray) -> float:
+    a = np.asarray(a, dtype=np.float32)
+    b = np.asarray(b, dtype=np.float32)
+    if a.shape != b.shape or a.size == 0:
         return 0.0
 
-    dot = sum(x * y for x, y in zip(a, b))
-    norm_a = sqrt(sum(x * x for x in a))
-    norm_b = sqrt(sum(y * y for y in b))
+    norm_a = float(np.linalg.norm(a))
+    norm_b = float(np.linalg.norm(b))
     if norm_a == 0.0 or norm_b == 0.0:
         return 0.0
-    return dot / (norm_a * norm_b)
+    return float(np.dot(a, b)) / (norm_a * norm_b)
 
 
 def rank_chunks(
-    question: str, chunks: list[Chunk], embedder: Embedder
+    question: str,
+    chunks: list[Chunk],
+    embedder: Embedder,
+    candidate_ids: set[int] | None = None,
 ) -> list[tuple[Chunk, float]]:
+    """Rank chunks by cosine similarity to the question.
+
+    ``candidate_ids`` restricts scoring to those chunk ids (e.g. the result of
+    a metadata pre-filter); other chunks are neither embedded nor returned.
+    """
+    if candidate_ids is not None:
+        chunks = [chunk for chunk in chunks if chunk.chunk_id in candidate_ids]
     if not chunks:
         return []
 
-    question_embedding = embedder.embed([question])[0]
+    # Chunks first: on a cold cache with workers > 1 they go to the pool
+    # before the in-process model is loaded for the question.
     chunk_embeddings = embedder.embed([chunk.text for chunk in chunks])
+    question_embedding = embedder.embed([question])[0]
+
+    norms = np.linalg.norm(chunk_embeddings, axis=1) * np.linalg.norm(
+        question_embedding
+    )
+    dots = chunk_embeddings @ question_embedding
+    scores = np.divide(dots, norms, out=np.zeros_like(dots), where=norms != 0)
 
-    ranked = [
-        (chunk, cosine_similarity(question_embedding, embedding))
-        for chunk, embedding in zip(chunks, chunk_embeddings)
-    ]
+    ranked = [(chunk, float(score)) for chunk, score in zip(chunks, scores)]
     ranked.sort(key=lambda item: item[1], reverse=True)
     return ranked
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import copy
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+# Paraphrases such as "who had the vault key" / "which person held the vault
+# key" must clear this with all-MiniLM-L6-v2; tests/test_semantic_cache.py
+# checks it whenever that model can be loaded.
+DEFAULT_THRESHOLD = 0.85
+
+
+def story_version(path: Path) -> str:
+    """Content hash of the story file, so edits invalidate cached answers."""
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+@dataclass
+class _Entry:
+    story_version: str
+    embedding: np.ndarray
+    chunk_ids: frozenset[int]
+    result: dict
+
+
+class SemanticCache:
+    """LRU cache of answers keyed by story version and question embedding.
+
+    A lookup hits when a cached question for the same story version has a
+    cosine similarity of at least ``threshold`` with the new question and
+    selected the same set of evidence chunk ids (in any order). Results are
+    deep-copied in and out, so callers may mutate what they get back. A
+    disabled cache never hits and stores nothing.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        threshold: float = DEFAULT_THRESHOLD,
+        enabled: bool = True,
+    ) -> None:
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.enabled = enabled
+        self._entries: OrderedDict[int, _Entry] = OrderedDict()
+        self._next_key = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def lookup(
+        self, version: str, embedding: np.ndarray, chunk_ids: list[int]
+    ) -> dict | None:
+        if not self.enabled:
+            return None
+        query = _normalize(embedding)
+        wanted = frozenset(chunk_ids)
+        with self._lock:
+            best_key: int | None = None
+            best_score = self.threshold
+            for key, entry in self._entries.items():
+                if entry.story_version != version or entry.chunk_ids != wanted:
+                    continue
+                score = float(np.dot(entry.embedding, query))
+                if score >= best_score:
+                    best_key, best_score = key, score
+
+            if best_key is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+            self._entries.move_to_end(best_key)
+            return copy.deepcopy(self._entries[best_key].result)
+
+    def store(
+        self, version: str, embedding: np.ndarray, chunk_ids: list[int], result: dict
+    ) -> None:
+        if not self.enabled:
+            return
+        entry = _Entry(
+            version, _normalize(embedding), frozenset(chunk_ids), copy.deepcopy(result)
+        )
+        with self._lock:
+            self._entries[self._next_key] = entry
+            self._next_key += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self) -> None:
+        """Drop all entries and reset the statistics."""
+        with self._lock:
+            self._entries.clear()
+            self._hits = 0
+            self._misses = 0
+            self._evictions = 0
+
+    def stats(self) -> dict[str, float]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+                "size": len(self._entries),
+            }
+
+
+def _normalize(embedding: np.ndarray) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
@@ -12,6 +12,20 @@ class Message:
     receiver: str
     body: str
     raw_xml: str
+    ts: str = ""
+    chapter: str = ""
+
+
+@dataclass
+class Participants:
+    """Declared ``<person>`` ids and ``<group>`` ids with their explicit members.
+
+    A group without ``<member ref>`` children maps to an empty set; callers
+    that have the messages can derive its members from who posted to it.
+    """
+
+    persons: set[str]
+    groups: dict[str, set[str]]
 
 
 def _localname(tag: str) -> str:
@@ -34,13 +48,46 @@ def _find_first_child_by_localnames(
     return None
 
 
-def load_story_xml(path: Path) -> list[Message]:
+def _chapter_lookup(root: ET.Element) -> dict[int, str]:
+    """Map ``id()`` of every element inside a ``<chapter>`` to the chapter id."""
+    chapters: dict[int, str] = {}
+    for chapter_el in root.iter():
+        if _localname(chapter_el.tag).lower() != "chapter":
+            continue
+        chapter_id = chapter_el.get("id", "")
+        for elem in chapter_el.iter():
+            chapters[id(elem)] = chapter_id
+    return chapters
+
+
+def _parse_root(path: Path) -> ET.Element:
     try:
         content = path.read_text(encoding="utf-8-sig", errors="strict")
-        root = ET.fromstring(content)
+        return ET.fromstring(content)
     except (ET.ParseError, OSError, UnicodeError) as exc:
         raise ValueError(f"Failed to parse story XML at {path}") from exc
 
+
+def load_participants(path: Path) -> Participants:
+    root = _parse_root(path)
+    persons: set[str] = set()
+    groups: dict[str, set[str]] = {}
+    for elem in root.iter():
+        name = _localname(elem.tag).lower()
+        if name == "person" and elem.get("id"):
+            persons.add(elem.get("id", ""))
+        elif name == "group" and elem.get("id"):
+            groups[elem.get("id", "")] = {
+                member.get("ref", "")
+                for member in list(elem)
+                if _localname(member.tag).lower() == "member" and member.get("ref")
+            }
+    return Participants(persons=persons, groups=groups)
+
+
+def load_story_xml(path: Path) -> list[Message]:
+    root = _parse_root(path)
+
     try:
         message_elements = root.findall(".//{*}message")
     except SyntaxError:
@@ -62,6 +109,7 @@ def load_story_xml(path: Path) -> list[Message]:
             for elem in root.iter()
             if _localname(elem.tag).lower() in allowed
         ]
+    chapters = _chapter_lookup(root)
     messages: list[Message] = []
     if message_elements:
         for message_el in message_elements:
@@ -76,6 +124,8 @@ def load_story_xml(path: Path) -> list[Message]:
                     receiver=receiver_el.get("ref", "") if receiver_el is not None else "",
                     body=(body_el.text or "") if body_el is not None else "",
                     raw_xml=ET.tostring(message_el, encoding="unicode"),
+                    ts=message_el.get("ts", "") or message_el.get("time", ""),
+                    chapter=chapters.get(id(message_el), ""),
                 )
             )
         return messages
@@ -113,6 +163,8 @@ def load_story_xml(path: Path) -> list[Message]:
                     receiver=receiver,
                     body=body,
                     raw_xml=ET.tostring(event_el, encoding="unicode"),
+                    ts=event_el.get("time", "") or event_el.get("ts", ""),
+                    chapter=chapters.get(id(event_el), ""),
                 )
             )
         return messages
@@ -1,13 +1,31 @@
 from __future__ import annotations
 
 import argparse
+import json
+import os
 import shutil
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from openai import OpenAI
+
+try:
+    from systems.token_estimate import estimate_tokens
+except ImportError:  # run as `python systems/ms_graphrag.py`
+    from token_estimate import estimate_tokens
+
+
+load_dotenv()
 
 WORKSPACE_ROOT = Path("ms_graphrag_workspace")
-INPUT_DIR = WORKSPACE_ROOT / "input"
+COMMUNITY_INDEX_NAME = "community_index.json"
+MAP_MAX_LENGTH = 500
+REDUCE_MAX_LENGTH = 2000
 DEFAULT_STORY = Path("data/story.txt")
 
 
@@ -16,32 +34,324 @@ def run_command(command: list[str], title: str) -> None:
     subprocess.run(command, check=True)
 
 
-def init_workspace() -> None:
-    WORKSPACE_ROOT.mkdir(parents=True, exist_ok=True)
+def init_workspace(root: Path = WORKSPACE_ROOT) -> None:
+    root.mkdir(parents=True, exist_ok=True)
     run_command(
-        ["graphrag", "init", "--root", str(WORKSPACE_ROOT), "--force"],
+        ["graphrag", "init", "--root", str(root), "--force"],
         "Initializing workspace",
     )
 
 
-def copy_story(story_path: Path) -> None:
-    INPUT_DIR.mkdir(parents=True, exist_ok=True)
-    destination = INPUT_DIR / story_path.name
+def copy_story(story_path: Path, root: Path = WORKSPACE_ROOT) -> None:
+    input_dir = root / "input"
+    input_dir.mkdir(parents=True, exist_ok=True)
+    destination = input_dir / story_path.name
     shutil.copy2(story_path, destination)
     print(f"[ms_graphrag] Copied story to {destination}")
 
 
-def build_index(story_path: Path) -> None:
-    copy_story(story_path)
+def build_index(story_path: Path, root: Path = WORKSPACE_ROOT) -> None:
+    copy_story(story_path, root)
     run_command(
-        ["graphrag", "index", "--root", str(WORKSPACE_ROOT)],
+        ["graphrag", "index", "--root", str(root)],
         "Building index",
     )
+    build_community_index(root)
+
+
+def openai_client() -> OpenAI:
+    api_key = os.getenv("GRAPHRAG_API_KEY") or os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError("GRAPHRAG_API_KEY or OPENAI_API_KEY is not set")
+    return OpenAI(api_key=api_key)
+
+
+def embed_texts(client: OpenAI, texts: list[str]) -> list[list[float]]:
+    model = os.getenv("EMBED_MODEL", "text-embedding-3-small")
+    response = client.embeddings.create(model=model, input=texts)
+    return [item.embedding for item in response.data]
+
+
+def build_community_index(root: Path = WORKSPACE_ROOT) -> None:
+    """Embed every community report once so global queries can rank them.
+
+    Writes ``community_index.json`` next to ``community_reports.parquet`` in
+    ``root/output``, ordered by level and then by GraphRAG's report rank.
+    """
+    output_dir = root / "output"
+    reports = pd.read_parquet(output_dir / "community_reports.parquet")
+    if reports.empty:
+        print("[ms_graphrag] No community reports to index.")
+        return
+
+    reports = reports.sort_values(["level", "rank"], ascending=[True, False])
+    rows = [
+        {
+            "community": str(row["community"]),
+            "level": int(row["level"]),
+            "parent": str(row["parent"]),
+            "title": str(row["title"]),
+            "rank": float(row["rank"]),
+            "content": str(row["full_content"]),
+            "tokens": estimate_tokens(str(row["full_content"])),
+        }
+        for _, row in reports.iterrows()
+    ]
+    summaries = [
+        f"{row['title']}\n{summary}"
+        for row, summary in zip(rows, reports["summary"].astype(str))
+    ]
+    embeddings = embed_texts(openai_client(), summaries)
+    for row, embedding in zip(rows, embeddings):
+        row["embedding"] = embedding
+
+    destination = output_dir / COMMUNITY_INDEX_NAME
+    destination.write_text(json.dumps(rows), encoding="utf-8")
+    print(f"[ms_graphrag] Indexed {len(rows)} community report(s) to {destination}")
+
+
+def _unit_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms != 0)
+
+
+@lru_cache(maxsize=4)
+def _load_community_index(
+    path: Path, mtime_ns: int
+) -> tuple[list[dict], np.ndarray]:
+    # Keyed by modification time as well as path, so a rebuilt index is
+    # reloaded. Rows drop their embeddings once the matrix is built.
+    rows = json.loads(path.read_text(encoding="utf-8"))
+    matrix = np.array([row.pop("embedding") for row in rows], dtype=float)
+    return rows, _unit_rows(matrix.reshape(len(rows), -1))
+
+
+def load_community_index(root: Path = WORKSPACE_ROOT) -> tuple[list[dict], np.ndarray]:
+    """Index rows and their unit-length embedding matrix, cached per file."""
+    path = root / "output" / COMMUNITY_INDEX_NAME
+    if not path.exists():
+        raise FileNotFoundError(
+            f"{path} not found; run --index or --community-index first"
+        )
+    return _load_community_index(path, path.stat().st_mtime_ns)
+
+
+def select_communities(
+    index: list[dict],
+    question_vector: list[float],
+    token_budget: int,
+    level: int | None = None,
+    report_overhead: int = 0,
+    unit_matrix: np.ndarray | None = None,
+) -> list[dict]:
+    """Most relevant reports (cosine, then report rank) that fit the budget.
+
+    Each report costs its own tokens plus ``report_overhead`` (the rest of
+    the map prompt it is sent with). ``unit_matrix`` holds the rows'
+    normalised embeddings; it is built from ``row["embedding"]`` if omitted.
+
+    Without a ``level`` the index holds every level of the hierarchy, so a
+    report is skipped when one of its ancestors or descendants was already
+    selected; otherwise the same text would be paid for twice.
+    """
+    positions = [
+        i for i, row in enumerate(index) if level is None or row["level"] == level
+    ]
+    if not positions:
+        return []
+    if unit_matrix is None:
+        unit_matrix = _unit_rows(
+            np.array([row["embedding"] for row in index], dtype=float)
+        )
+
+    question = np.asarray(question_vector, dtype=float)
+    question_norm = float(np.linalg.norm(question))
+    if question_norm:
+        scores = unit_matrix[positions] @ (question / question_norm)
+    else:
+        scores = np.zeros(len(positions))
+
+    order = sorted(
+        range(len(positions)),
+        key=lambda i: (scores[i], index[positions[i]]["rank"]),
+        reverse=True,
+    )
+    parents = {row["community"]: row.get("parent", "-1") for row in index}
+
+    def lineage(community: str) -> set[str]:
+        ancestors = {community}
+        while (community := parents.get(community, "-1")) in parents:
+            if community in ancestors:
+                break
+            ancestors.add(community)
+        return ancestors
+
+    selected: list[dict] = []
+    covered: list[set[str]] = []
+    used = 0
+    for i in order:
+        row = index[positions[i]]
+        cost = row["tokens"] + report_overhead
+        if selected and used + cost > token_budget:
+            continue
+        ancestors = lineage(row["community"])
+        if any(
+            row["community"] in other or other_row["community"] in ancestors
+            for other_row, other in zip(selected, covered)
+        ):
+            continue
+        selected.append(row)
+        covered.append(ancestors)
+        used += cost
+    return selected
+
+
+def _community_context(row: dict) -> str:
+    return (
+        "-----Reports-----\nid|title|content\n"
+        f"{row['community']}|{row['title']}|{row['content']}"
+    )
+
+
+def _parse_points(content: str) -> list:
+    # JSON mode should return a bare object, but some models and proxies
+    # still wrap it in a ```json fence.
+    text = content.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        text = text.rstrip()
+        if text.endswith("```"):
+            text = text[:-3]
+    try:
+        return json.loads(text).get("points", [])
+    except (json.JSONDecodeError, AttributeError):
+        # Models sometimes answer in prose; keep it as a single mid-score point.
+        return [{"description": content, "score": 50}] if content else []
+
+
+def _map_community(
+    client: OpenAI, llm_model: str, map_prompt: str, question: str, row: dict
+) -> list[dict]:
+    response = client.chat.completions.create(
+        model=llm_model,
+        messages=[
+            {
+                "role": "system",
+                "content": map_prompt.format(
+                    context_data=_community_context(row), max_length=MAP_MAX_LENGTH
+                ),
+            },
+            {"role": "user", "content": question},
+        ],
+        response_format={"type": "json_object"},
+    )
+    content = response.choices[0].message.content or ""
+    mapped: list[dict] = []
+    for point in _parse_points(content):
+        if not isinstance(point, dict) or not point.get("description"):
+            continue
+        try:
+            score = int(point.get("score", 0))
+        except (TypeError, ValueError):
+            # Same fallback as a prose answer: keep the point at mid score.
+            score = 50
+        mapped.append({"description": str(point["description"]), "score": score})
+    return mapped
+
+
+def global_query(
+    question: str,
+    level: int | None = None,
+    token_budget: int = 8000,
+    max_workers: int = 8,
+    root: Path = WORKSPACE_ROOT,
+) -> str:
+    """Global search over the precomputed community index.
 
+    Unlike ``graphrag query``, which maps over every community report, only
+    the reports most relevant to the question are sent to the map step, and
+    their map calls run concurrently. ``token_budget`` bounds the estimated
+    prompt tokens of the whole query: each map call's system prompt, report
+    and question, plus the reduce prompt and question. The points the map
+    calls return are added to the reduce prompt on top of that.
+    """
+    index, unit_matrix = load_community_index(root)
+    llm_model = os.getenv("LLM_MODEL", "gpt-4o-mini")
 
-def query(question: str) -> None:
+    prompts_dir = root / "prompts"
+    map_prompt = (prompts_dir / "global_search_map_system_prompt.txt").read_text(
+        encoding="utf-8"
+    )
+    reduce_prompt = (
+        prompts_dir / "global_search_reduce_system_prompt.txt"
+    ).read_text(encoding="utf-8")
+    question_tokens = estimate_tokens(question)
+    reduce_cost = question_tokens + estimate_tokens(
+        reduce_prompt.format(
+            report_data="",
+            response_type="multiple paragraphs",
+            max_length=REDUCE_MAX_LENGTH,
+        )
+    )
+    report_overhead = question_tokens + estimate_tokens(
+        map_prompt.format(
+            context_data=_community_context(
+                {"community": "", "title": "", "content": ""}
+            ),
+            max_length=MAP_MAX_LENGTH,
+        )
+    )
+
+    client = openai_client()
+    question_vector = embed_texts(client, [question])[0]
+    selected = select_communities(
+        index,
+        question_vector,
+        token_budget - reduce_cost,
+        level,
+        report_overhead=report_overhead,
+        unit_matrix=unit_matrix,
+    )
+    if not selected:
+        return "No community reports available for this level."
+
+    workers = max(1, min(max_workers, len(selected)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        mapped = pool.map(
+            lambda row: _map_community(client, llm_model, map_prompt, question, row),
+            selected,
+        )
+        points = [point for points in mapped for point in points if point["score"] > 0]
+    if not points:
+        return "The community reports do not contain enough information to answer."
+
+    points.sort(key=lambda point: point["score"], reverse=True)
+    report_data = "\n\n".join(
+        f"----Analyst {i}----\nImportance Score: {point['score']}\n"
+        f"{point['description']}"
+        for i, point in enumerate(points, start=1)
+    )
+    response = client.chat.completions.create(
+        model=llm_model,
+        messages=[
+            {
+                "role": "system",
+                "content": reduce_prompt.format(
+                    report_data=report_data,
+                    response_type="multiple paragraphs",
+                    max_length=REDUCE_MAX_LENGTH,
+                ),
+            },
+            {"role": "user", "content": question},
+        ],
+    )
+    content = response.choices[0].message.content
+    return content or "Model returned an empty answer."
+
+
+def query(question: str, root: Path = WORKSPACE_ROOT) -> None:
     run_command(
-        ["graphrag", "query", "--root", str(WORKSPACE_ROOT), question],
+        ["graphrag", "query", "--root", str(root), question],
         "Running query",
     )
 
@@ -50,22 +360,49 @@ def main() -> None:
     parser = argparse.ArgumentParser(
         description="Microsoft GraphRAG CLI wrapper"
     )
+    parser.add_argument(
+        "--root",
+        type=Path,
+        default=WORKSPACE_ROOT,
+        help="GraphRAG workspace (settings.yaml, input/, output/, prompts/)",
+    )
     parser.add_argument("--init", action="store_true")
     parser.add_argument("--index", action="store_true")
     parser.add_argument("--story", type=Path, default=DEFAULT_STORY)
+    parser.add_argument("--community-index", action="store_true")
     parser.add_argument("--q")
+    parser.add_argument(
+        "--global",
+        dest="global_search",
+        action="store_true",
+        help="Answer --q from the precomputed community index",
+    )
+    parser.add_argument("--level", type=int)
+    parser.add_argument("--budget", type=int, default=8000)
     args = parser.parse_args()
 
     if args.init:
-        init_workspace()
+        init_workspace(args.root)
         return
     if args.index:
-        build_index(args.story)
+        build_index(args.story, args.root)
+        return
+    if args.community_index:
+        build_community_index(args.root)
+        return
+    if args.q and args.global_search:
+        print(
+            global_query(
+                args.q, level=args.level, token_budget=args.budget, root=args.root
+            )
+        )
         return
     if args.q:
-        query(args.q)
+        query(args.q, args.root)
         return
-    parser.error("Provide one of: --init, --index, or --q \"...\"")
+    parser.error(
+        "Provide one of: --init, --index, --community-index, or --q \"...\""
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,7 @@
+from __future__ import annotations
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 chars/token) used for prompt budgets and the
+    local stand-in server's usage numbers."""
+    return max(1, len(text) // 4) if text else 0
@@ -0,0 +1,94 @@
+import json
+import urllib.request
+
+from src.bench import BenchEngine, load_questions, percentile, run_engine
+from src.local_servers import LocalModelServer
+
+
+def _post(url: str, payload: dict) -> dict:
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+def test_load_questions_jsonl_and_text(tmp_path) -> None:
+    jsonl = tmp_path / "q.jsonl"
+    jsonl.write_text(
+        '{"question": "Who had the key?"}\n\n{"title": "What happened at 09:25?"}\n',
+        encoding="utf-8",
+    )
+    text = tmp_path / "q.txt"
+    text.write_text("Who had the key?\n\nWhere is the USB?\n", encoding="utf-8")
+
+    assert load_questions(jsonl) == ["Who had the key?", "What happened at 09:25?"]
+    assert load_questions(text) == ["Who had the key?", "Where is the USB?"]
+
+
+def test_percentile_nearest_rank() -> None:
+    values = [float(v) for v in range(1, 101)]
+
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 95) == 95.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([], 50) == 0.0
+
+
+def test_local_server_is_deterministic() -> None:
+    with LocalModelServer() as server:
+        payload = {"model": "text-embedding-3-small", "input": ["vault key"]}
+        first = _post(f"{server.openai_base_url}/embeddings", payload)
+        second = _post(f"{server.openai_base_url}/embeddings", payload)
+        chat = _post(
+            f"{server.openai_base_url}/chat/completions",
+            {"model": "m", "messages": [{"role": "user", "content": "Who?"}]},
+        )
+
+        assert first["data"][0]["embedding"] == second["data"][0]["embedding"]
+        assert len(first["data"][0]["embedding"]) == 1536
+        assert chat["choices"][0]["message"]["content"].startswith("Stand-in")
+        assert server.usage()["llm_calls"] == 1
+
+
+def test_run_engine_reports_latency_and_tokens() -> None:
+    with LocalModelServer() as server:
+        url = f"{server.openai_base_url}/chat/completions"
+
+        def answer(question: str) -> str:
+            if question == "boom":
+                raise RuntimeError("engine failed")
+            body = {"messages": [{"role": "user", "content": question * 10}]}
+            return _post(url, body)["choices"][0]["message"]["content"]
+
+        indexed: list[bool] = []
+        engine = BenchEngine("fake", answer, lambda: indexed.append(True))
+        report = run_engine(engine, ["q1", "q2", "q3", "boom"], 2, server)
+
+    assert indexed == [True]
+    assert report.questions == 4
+    assert report.errors == 1
+    assert report.first_error == "engine failed"
+    assert report.llm_calls == 3
+    assert report.prompt_tokens == 15
+    assert len(report.latencies_ms) == 3
+    assert report.p50_ms <= report.p95_ms <= report.p99_ms
+    assert report.index_s is not None
+
+
+def test_run_engine_resets_cache_and_reports_stats() -> None:
+    events: list[str] = []
+    engine = BenchEngine(
+        "cached",
+        lambda q: events.append(q),
+        index=lambda: events.append("index"),
+        reset=lambda: events.append("reset"),
+        cache_stats=lambda: {"hits": 2, "misses": 1},
+    )
+
+    report = run_engine(engine, ["q1", "q2", "q3"], 1, None)
+
+    assert events[:2] == ["index", "reset"]
+    assert (report.cache_hits, report.cache_misses) == (2, 1)
@@ -0,0 +1,107 @@
+from pathlib import Path
+
+from src.chunker import chunk_messages
+from src.metadata_index import MetadataIndex, StoryFilter, parse_filters
+from src.story_loader import load_participants, load_story_xml
+
+STORIES = Path(__file__).resolve().parents[1] / "stories"
+
+
+def _index(name: str):
+    messages = load_story_xml(STORIES / name)
+    chunks = chunk_messages(messages, messages_per_chunk=3)
+    index = MetadataIndex(messages, chunks, load_participants(STORIES / name))
+    return messages, chunks, index
+
+
+def test_loader_keeps_time_and_chapter() -> None:
+    messages = load_story_xml(STORIES / "whodunit_sydney.xml")
+    events = load_story_xml(STORIES / "sample_story.xml")
+
+    assert messages[0].ts == "2025-08-29T17:42:03+10:00"
+    assert messages[0].chapter == "1"
+    assert [event.ts for event in events] == ["08:10", "09:25", "11:40"]
+
+
+def test_parse_filters_time_and_participants() -> None:
+    at = parse_filters("What happened at 09:25?", set())
+    liam = parse_filters("what did Liam send after 18:00", {"liam", "zoe"})
+    between = parse_filters("Messages to Zoe between 7:00 pm and 7:30pm", {"zoe"})
+
+    assert (at.time_from, at.time_to) == (9 * 3600 + 25 * 60, 9 * 3600 + 25 * 60 + 59)
+    assert liam.senders == {"liam"}
+    assert liam.time_from == 18 * 3600 and liam.time_to is None
+    assert between.receivers == {"zoe"}
+    assert (between.time_from, between.time_to) == (19 * 3600, 19 * 3600 + 30 * 60 + 59)
+    assert parse_filters("Summarize the core mystery.", {"liam"}).is_empty()
+
+
+def test_bare_names_and_groups_do_not_filter() -> None:
+    _messages, _chunks, index = _index("whodunit_sydney.xml")
+
+    persons = {"alex", "priya", "liam", "zoe", "marcus", "sienna", "jax"}
+    assert index.participants == persons
+    assert parse_filters(
+        "Where was Liam when the vault was opened?", index.participants
+    ).is_empty()
+    assert parse_filters(
+        "What did the six of them agree on?", index.participants
+    ).is_empty()
+
+
+def test_group_messages_count_as_received_by_members() -> None:
+    messages, _chunks, index = _index("whodunit_sydney.xml")
+    story_filter = parse_filters("what did Zoe say to Liam", index.participants)
+
+    positions = index.message_positions(story_filter)
+
+    assert (story_filter.senders, story_filter.receivers) == ({"zoe"}, {"liam"})
+    assert {messages[position].receiver for position in positions} >= {"six"}
+    assert all(messages[position].sender == "zoe" for position in positions)
+    own = index.message_positions(StoryFilter(senders={"liam"}, receivers={"liam"}))
+    assert own == set()
+
+
+def test_event_time_filter_selects_chunk() -> None:
+    _messages, _chunks, index = _index("sample_story.xml")
+
+    assert index.message_positions(parse_filters("What happened at 09:25?", set())) == {1}
+    assert index.chunk_ids(StoryFilter(time_from=12 * 3600)) == set()
+
+
+def test_sender_and_time_filters_intersect() -> None:
+    messages, chunks, index = _index("whodunit_sydney.xml")
+    story_filter = StoryFilter(time_from=18 * 3600, senders={"liam"}, chapters={"1"})
+
+    positions = index.message_positions(story_filter)
+
+    assert positions
+    for position in positions:
+        message = messages[position]
+        assert message.sender == "liam"
+        assert message.chapter == "1"
+        assert message.ts[11:16] >= "18:00"
+    expected_chunks = {
+        chunk.chunk_id
+        for chunk in chunks
+        if any(messages[p].id in chunk.message_ids for p in positions)
+    }
+    assert index.chunk_ids(story_filter) == expected_chunks
+    assert index.message_positions(StoryFilter()) == set(range(len(messages)))
+
+
+def test_unknown_chapter_words_do_not_void_other_filters() -> None:
+    messages, _chunks, index = _index("whodunit_sydney.xml")
+    question = "In the chapter where Liam sent the photo, what happened after 18:00?"
+
+    parsed = parse_filters(question, index.participants, index.chapters)
+
+    assert parsed.chapters == set()
+    assert parsed.senders == {"liam"} and parsed.time_from == 18 * 3600
+    two = parse_filters("what happened in chapter two", set(), index.chapters)
+    assert two.chapters == {"2"}
+    assert parse_filters("in chapter 99", set()).chapters == {"99"}
+
+    relaxed = index.without_unmatched(StoryFilter(senders={"liam"}, chapters={"99"}))
+    assert relaxed == StoryFilter(senders={"liam"})
+    assert {messages[p].sender for p in index.message_positions(relaxed)} == {"liam"}
@@ -0,0 +1,163 @@
+import json
+import os
+
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("openai")
+pytest.importorskip("dotenv")
+
+from systems import ms_graphrag  # noqa: E402
+
+
+def _row(community: str, level: int, parent: str, rank: float, tokens: int, vec):
+    return {
+        "community": community,
+        "level": level,
+        "parent": parent,
+        "title": f"Community {community}",
+        "rank": rank,
+        "content": "",
+        "tokens": tokens,
+        "embedding": vec,
+    }
+
+
+def _communities(rows: list[dict]) -> list[str]:
+    return [row["community"] for row in rows]
+
+
+def test_select_communities_budget_cutoff() -> None:
+    index = [
+        _row("0", 0, "-1", 5.0, 60, [1.0, 0.0]),
+        _row("1", 0, "-1", 5.0, 60, [0.9, 0.1]),
+        _row("2", 0, "-1", 5.0, 30, [0.5, 0.5]),
+    ]
+
+    selected = ms_graphrag.select_communities(index, [1.0, 0.0], token_budget=100)
+
+    # "1" does not fit after "0", but the smaller "2" still does.
+    assert _communities(selected) == ["0", "2"]
+    # The best report is always kept, even when it alone exceeds the budget.
+    assert _communities(ms_graphrag.select_communities(index, [1.0, 0.0], 10)) == ["0"]
+
+
+def test_select_communities_level_filter_and_rank_tie_break() -> None:
+    index = [
+        _row("0", 0, "-1", 6.0, 10, [1.0, 0.0]),
+        _row("1", 0, "-1", 8.5, 10, [1.0, 0.0]),
+        _row("2", 1, "0", 9.0, 10, [1.0, 0.0]),
+    ]
+
+    selected = ms_graphrag.select_communities(index, [1.0, 0.0], 1000, level=0)
+
+    assert _communities(selected) == ["1", "0"]
+    assert ms_graphrag.select_communities(index, [1.0, 0.0], 1000, level=3) == []
+
+
+def test_select_communities_skips_parent_and_child_of_selected() -> None:
+    index = [
+        _row("0", 0, "-1", 7.0, 10, [0.8, 0.2]),
+        _row("1", 0, "-1", 7.0, 10, [0.0, 1.0]),
+        _row("9", 1, "0", 7.0, 10, [1.0, 0.0]),
+        _row("10", 1, "1", 7.0, 10, [0.7, 0.7]),
+    ]
+
+    selected = ms_graphrag.select_communities(index, [1.0, 0.0], 1000)
+
+    # "0" is the parent of the selected "9"; "1" is the parent of "10".
+    assert _communities(selected) == ["9", "10"]
+
+
+def test_select_communities_charges_map_overhead_per_report() -> None:
+    index = [
+        _row("0", 0, "-1", 5.0, 10, [1.0, 0.0]),
+        _row("1", 0, "-1", 5.0, 10, [0.9, 0.1]),
+        _row("2", 0, "-1", 5.0, 10, [0.5, 0.5]),
+    ]
+
+    selected = ms_graphrag.select_communities(
+        index, [1.0, 0.0], token_budget=250, report_overhead=100
+    )
+
+    assert _communities(selected) == ["0", "1"]
+
+
+class _Completions:
+    def __init__(self, content: str) -> None:
+        self.content = content
+        self.kwargs: dict = {}
+
+    def create(self, **kwargs):
+        self.kwargs = kwargs
+        message = type("Message", (), {"content": self.content})
+        choice = type("Choice", (), {"message": message})
+        return type("Response", (), {"choices": [choice]})
+
+
+class _Client:
+    def __init__(self, content: str) -> None:
+        self.chat = type("Chat", (), {"completions": _Completions(content)})
+
+
+def test_map_community_falls_back_on_bad_scores() -> None:
+    row = _row("0", 0, "-1", 7.0, 10, [1.0, 0.0])
+    content = (
+        '{"points": [{"description": "Liam had the key", "score": "high"},'
+        ' {"description": "Zoe saw the vault", "score": 80},'
+        ' {"description": "", "score": 90}]}'
+    )
+
+    points = ms_graphrag._map_community(
+        _Client(content), "m", "{context_data} {max_length}", "Who?", row
+    )
+    prose = ms_graphrag._map_community(
+        _Client("Liam had the key."), "m", "{context_data} {max_length}", "Who?", row
+    )
+
+    assert points == [
+        {"description": "Liam had the key", "score": 50},
+        {"description": "Zoe saw the vault", "score": 80},
+    ]
+    assert prose == [{"description": "Liam had the key.", "score": 50}]
+
+
+def test_map_community_requests_json_and_strips_fences() -> None:
+    row = _row("0", 0, "-1", 7.0, 10, [1.0, 0.0])
+    client = _Client(
+        '```json\n{"points": [{"description": "Liam had the key", "score": 90},'
+        ' {"description": "Nothing else", "score": 0}]}\n```'
+    )
+
+    points = ms_graphrag._map_community(
+        client, "m", "{context_data} {max_length}", "Who?", row
+    )
+
+    assert client.chat.completions.kwargs["response_format"] == {
+        "type": "json_object"
+    }
+    assert points == [
+        {"description": "Liam had the key", "score": 90},
+        {"description": "Nothing else", "score": 0},
+    ]
+
+
+def test_community_index_is_loaded_once_per_file_version(tmp_path) -> None:
+    output = tmp_path / "output"
+    output.mkdir()
+    path = output / ms_graphrag.COMMUNITY_INDEX_NAME
+    path.write_text(
+        json.dumps([_row("0", 0, "-1", 7.0, 10, [3.0, 4.0])]), encoding="utf-8"
+    )
+
+    rows, matrix = ms_graphrag.load_community_index(tmp_path)
+
+    assert ms_graphrag.load_community_index(tmp_path)[0] is rows
+    assert "embedding" not in rows[0]
+    assert matrix.tolist() == [[0.6, 0.8]]
+
+    path.write_text(
+        json.dumps([_row("1", 0, "-1", 7.0, 10, [1.0, 0.0])]), encoding="utf-8"
+    )
+    os.utime(path, ns=(0, path.stat().st_mtime_ns + 1_000_000))
+    assert _communities(ms_graphrag.load_community_index(tmp_path)[0]) == ["1"]
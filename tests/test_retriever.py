@@ -0,0 +1,97 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from src import retriever
+from src.chunker import Chunk
+from src.retriever import Embedder, rank_chunks
+
+
+class FakeModel:
+    """Encodes each text as [length, first char code, 1] and records batches."""
+
+    def __init__(self) -> None:
+        self.calls: list[list[str]] = []
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True):
+        self.calls.append(list(texts))
+        return np.array([[len(t), ord(t[0]), 1.0] for t in texts], dtype=np.float64)
+
+
+class RecordingPool(ThreadPoolExecutor):
+    created: list["RecordingPool"] = []
+
+    def __init__(self, *_args) -> None:
+        super().__init__(max_workers=3)
+        self.closed = False
+        RecordingPool.created.append(self)
+
+    def shutdown(self, *args, **kwargs) -> None:
+        self.closed = True
+        super().shutdown(*args, **kwargs)
+
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    model = FakeModel()
+    monkeypatch.setattr(retriever, "_MODEL", model)
+    monkeypatch.setattr(retriever, "_EMBED_CACHE", {})
+    return model
+
+
+def test_embed_sorts_by_length_and_restores_order(fake_model) -> None:
+    texts = ["bb", "dddd", "a", "ccc", "bb"]
+
+    vectors = Embedder(workers=1, batch_size=8).embed(texts)
+
+    assert vectors.dtype == np.float32
+    assert vectors[:, 0].tolist() == [2, 4, 1, 3, 2]
+    assert vectors[:, 1].tolist() == [ord(t[0]) for t in texts]
+    assert fake_model.calls == [["dddd", "ccc", "bb", "a"]]
+
+
+def test_pool_path_matches_single_process(fake_model, monkeypatch) -> None:
+    texts = [chr(ord("a") + i % 26) * (1 + (i * 7) % 13) for i in range(50)]
+    expected = fake_model.encode(texts).astype(np.float32)
+
+    monkeypatch.setattr(retriever, "_WORKER_MODEL", fake_model)
+    monkeypatch.setattr(retriever, "_make_pool", RecordingPool)
+    vectors = Embedder(workers=3, batch_size=4).embed(texts)
+
+    np.testing.assert_array_equal(vectors, expected)
+    shard_calls = fake_model.calls[1:]
+    assert len(shard_calls) > 1
+    assert [len(t) for shard in shard_calls for t in shard] == sorted(
+        (len(t) for t in set(texts)), reverse=True
+    )
+
+
+def test_pool_is_closed_and_parent_model_stays_unloaded(monkeypatch) -> None:
+    worker_model = FakeModel()
+    monkeypatch.setattr(retriever, "_MODEL", None)
+    monkeypatch.setattr(retriever, "_EMBED_CACHE", {})
+    monkeypatch.setattr(retriever, "_WORKER_MODEL", worker_model)
+    monkeypatch.setattr(retriever, "_make_pool", RecordingPool)
+    monkeypatch.setattr(RecordingPool, "created", [])
+
+    Embedder(workers=2, batch_size=1).embed(["a", "bb", "ccc"])
+
+    assert retriever._MODEL is None
+    assert [pool.closed for pool in RecordingPool.created] == [True]
+
+
+def test_explicit_zero_workers_is_not_env_default(fake_model, monkeypatch) -> None:
+    monkeypatch.setenv("EMBED_WORKERS", "8")
+
+    assert Embedder(workers=0)._workers == 1
+    assert Embedder()._workers == 8
+
+
+def test_rank_chunks_orders_by_cosine(fake_model) -> None:
+    chunks = [Chunk(0, [], "zz"), Chunk(1, [], "aaaa"), Chunk(2, [], "a")]
+
+    ranked = rank_chunks("aaaa", chunks, Embedder(workers=1))
+
+    assert [chunk.chunk_id for chunk, _score in ranked][0] == 1
+    assert rank_chunks("a", chunks, Embedder(workers=1), {2})[0][0].chunk_id == 2
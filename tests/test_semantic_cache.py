@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+
+from src.semantic_cache import DEFAULT_THRESHOLD, SemanticCache
+
+
+def _result(answer: str) -> dict:
+    return {"answer": answer, "evidence": [], "why_not": ""}
+
+
+def test_near_duplicate_with_same_chunks_hits() -> None:
+    cache = SemanticCache(threshold=0.9)
+    cache.store("v1", np.array([1.0, 0.0]), [3, 1], _result("Liam"))
+
+    hit = cache.lookup("v1", np.array([0.98, 0.05]), [3, 1])
+
+    assert hit == _result("Liam")
+    assert cache.stats()["hits"] == 1
+
+
+def test_chunk_order_does_not_matter() -> None:
+    cache = SemanticCache(threshold=0.9)
+    cache.store("v1", np.array([1.0, 0.0]), [3, 1], _result("Liam"))
+
+    assert cache.lookup("v1", np.array([1.0, 0.0]), [1, 3]) == _result("Liam")
+
+
+def test_different_chunks_version_or_far_question_misses() -> None:
+    cache = SemanticCache(threshold=0.9)
+    cache.store("v1", np.array([1.0, 0.0]), [3, 1], _result("Liam"))
+
+    assert cache.lookup("v1", np.array([1.0, 0.0]), [1, 3, 4]) is None
+    assert cache.lookup("v2", np.array([1.0, 0.0]), [3, 1]) is None
+    assert cache.lookup("v1", np.array([0.0, 1.0]), [3, 1]) is None
+    assert cache.stats()["misses"] == 3
+
+
+def test_lru_eviction_keeps_recently_used() -> None:
+    cache = SemanticCache(max_entries=2, threshold=0.99)
+    cache.store("v1", np.array([1.0, 0.0, 0.0]), [0], _result("a"))
+    cache.store("v1", np.array([0.0, 1.0, 0.0]), [0], _result("b"))
+    assert cache.lookup("v1", np.array([1.0, 0.0, 0.0]), [0]) is not None
+
+    cache.store("v1", np.array([0.0, 0.0, 1.0]), [0], _result("c"))
+
+    assert cache.lookup("v1", np.array([0.0, 1.0, 0.0]), [0]) is None
+    assert cache.lookup("v1", np.array([1.0, 0.0, 0.0]), [0]) == _result("a")
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["size"] == 2
+
+
+def test_disabled_cache_and_clear() -> None:
+    cache = SemanticCache(threshold=0.9, enabled=False)
+    cache.store("v1", np.array([1.0, 0.0]), [0], _result("a"))
+    assert cache.lookup("v1", np.array([1.0, 0.0]), [0]) is None
+    assert cache.stats()["size"] == 0
+
+    cache.enabled = True
+    cache.store("v1", np.array([1.0, 0.0]), [0], _result("a"))
+    cache.lookup("v1", np.array([1.0, 0.0]), [0])
+    cache.clear()
+
+    assert cache.stats() == {
+        "hits": 0, "misses": 0, "hit_rate": 0.0, "evictions": 0, "size": 0
+    }
+
+
+def test_hits_do_not_share_mutable_results() -> None:
+    cache = SemanticCache(threshold=0.9)
+    stored = {"answer": "Liam", "evidence": [{"chunk_id": 3, "text": "..."}]}
+    cache.store("v1", np.array([1.0, 0.0]), [3], stored)
+    stored["evidence"].clear()
+
+    first = cache.lookup("v1", np.array([1.0, 0.0]), [3])
+    first["evidence"][0]["text"] = "changed"
+    second = cache.lookup("v1", np.array([1.0, 0.0]), [3])
+
+    assert second["evidence"] == [{"chunk_id": 3, "text": "..."}]
+
+
+def test_default_threshold_with_minilm() -> None:
+    sentence_transformers = pytest.importorskip("sentence_transformers")
+    try:
+        model = sentence_transformers.SentenceTransformer("all-MiniLM-L6-v2")
+    except OSError as exc:
+        pytest.skip(f"all-MiniLM-L6-v2 is not available: {exc}")
+    question, paraphrase, unrelated = model.encode(
+        [
+            "who had the vault key",
+            "which person held the vault key",
+            "who stole the USB drive",
+        ],
+        normalize_embeddings=True,
+    )
+
+    assert float(question @ paraphrase) >= DEFAULT_THRESHOLD
+    assert float(question @ unrelated) < DEFAULT_THRESHOLD
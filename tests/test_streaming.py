@@ -0,0 +1,158 @@
+import json
+import time
+import urllib.request
+from pathlib import Path
+
+import pytest
+
+from src.local_servers import LocalModelServer, fake_answer
+
+
+def _stream_url(server: LocalModelServer) -> str:
+    return (
+        f"{server.base_url}/v1beta/models/gemini-2.5-flash:streamGenerateContent"
+        "?alt=sse"
+    )
+
+
+def test_local_server_streams_answer_in_chunks() -> None:
+    payload = {"contents": [{"role": "user", "parts": [{"text": "Who?"}]}]}
+    with LocalModelServer(answer_words=10, stream_chunk_words=3) as server:
+        request = urllib.request.Request(
+            _stream_url(server),
+            data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request) as response:
+            events = [
+                json.loads(line[len("data: ") :])
+                for line in response.read().decode("utf-8").splitlines()
+                if line.startswith("data: ")
+            ]
+
+    texts = [event["candidates"][0]["content"]["parts"][0]["text"] for event in events]
+    assert len(texts) == 4
+    assert "".join(texts) == fake_answer("Who?", 10)
+
+
+def test_gemini_client_generate_stream(monkeypatch) -> None:
+    pytest.importorskip("google.genai")
+    pytest.importorskip("dotenv")
+    from src.gemini_client import GeminiClient
+
+    with LocalModelServer(answer_words=12, stream_chunk_words=5) as server:
+        monkeypatch.setenv("GEMINI_API_KEY", "local-stand-in")
+        monkeypatch.setenv("GEMINI_BASE_URL", server.base_url)
+        pieces = list(GeminiClient().generate_stream("Who had the vault key?"))
+
+    assert len(pieces) > 1
+    assert "".join(pieces) == fake_answer("Who had the vault key?", 12)
+
+
+class _FakeGemini:
+    pieces = ["The key ", "was with ", "Liam."]
+    fail_after: int | None = None
+    calls = 0
+
+    def generate_stream(self, prompt: str):
+        type(self).calls += 1
+        for i, piece in enumerate(self.pieces):
+            if self.fail_after is not None and i == self.fail_after:
+                raise RuntimeError("stream dropped")
+            yield piece
+
+
+@pytest.fixture
+def naive_rag(monkeypatch):
+    pytest.importorskip("google.genai")
+    pytest.importorskip("dotenv")
+    from src.engines import naive_rag
+
+    monkeypatch.setattr(_FakeGemini, "fail_after", None)
+    monkeypatch.setattr(_FakeGemini, "calls", 0)
+    monkeypatch.setattr(naive_rag, "GeminiClient", _FakeGemini)
+    naive_rag.reset_cache()
+    yield naive_rag
+    naive_rag.reset_cache()
+
+
+def _retrieval(naive_rag, chunk_ids: list[int]):
+    import numpy as np
+
+    return naive_rag.Retrieval(
+        prompt="Question: who had the vault key?",
+        evidence=[{"chunk_id": i, "text": f"chunk {i}"} for i in chunk_ids],
+        version="v1",
+        question_embedding=np.array([1.0, 0.0]),
+        chunk_ids=chunk_ids,
+    )
+
+
+def test_streaming_answer_sets_result_and_feeds_cache(naive_rag) -> None:
+    answer = naive_rag.StreamingAnswer(_retrieval(naive_rag, [3, 1]))
+    assert answer.result is None
+
+    assert list(answer) == _FakeGemini.pieces
+    assert answer.result["answer"] == "The key was with Liam."
+    assert answer.result["why_not"] == ""
+
+    # A retrieval prepared before the first answer was stored still hits,
+    # because the cache is consulted when generation starts.
+    rephrased = naive_rag.StreamingAnswer(_retrieval(naive_rag, [1, 3]))
+    assert list(rephrased) == ["The key was with Liam."]
+    assert _FakeGemini.calls == 1
+    assert naive_rag.cache_stats()["hits"] == 1
+
+
+def test_streaming_answer_error_after_partial_output(naive_rag, monkeypatch) -> None:
+    monkeypatch.setattr(_FakeGemini, "fail_after", 2)
+    answer = naive_rag.StreamingAnswer(_retrieval(naive_rag, [0]))
+
+    assert list(answer) == ["The key ", "was with "]
+    assert answer.result["answer"] == "The key was with "
+    assert answer.result["why_not"] == "stream dropped"
+    assert answer.result["evidence"] == [{"chunk_id": 0, "text": "chunk 0"}]
+    assert naive_rag.cache_stats()["size"] == 0
+
+
+class _SlowStdin:
+    """Yields q1, then q2 while q1 is still streaming."""
+
+    def __iter__(self):
+        yield "q1\n"
+        time.sleep(0.15)
+        yield "q2\n"
+        yield "exit\n"
+
+
+def test_repl_retrieves_next_question_while_streaming(monkeypatch, capsys) -> None:
+    pytest.importorskip("google.genai")
+    pytest.importorskip("dotenv")
+    from src import main
+
+    events: list[tuple[str, float]] = []
+
+    class FakeAnswer:
+        def __init__(self, question: str) -> None:
+            self.question = question
+            self.result = None
+
+        def __iter__(self):
+            for i in range(4):
+                time.sleep(0.1)
+                yield f"{self.question}-{i} "
+            events.append((f"{self.question} streamed", time.perf_counter()))
+            self.result = {"answer": "", "evidence": [], "why_not": ""}
+
+    def stream_fn(_story_path, question):
+        events.append((f"{question} retrieved", time.perf_counter()))
+        return FakeAnswer(question)
+
+    monkeypatch.setattr(main.sys, "stdin", _SlowStdin())
+    main.run_streaming_repl(Path("story.xml"), stream_fn)
+
+    times = dict(events)
+    assert times["q2 retrieved"] < times["q1 streamed"]
+    out = capsys.readouterr().out
+    assert out.index("q1-3") < out.index("q2-0")
+    assert out.rstrip().endswith("Exiting.")